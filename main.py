@@ -1,7 +1,13 @@
 """TikTok Daily Quote Automation — pipeline entry point."""
 
+import asyncio
+import multiprocessing
+import os
 import sys
+import traceback
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -11,12 +17,82 @@ from src.emailer import send_daily_videos
 from src.quote_fetcher import fetch_quote
 from src.tiktok_poster import post_video
 from src.video_composer import compose_video
-from src.video_fetcher import fetch_video
+from src.video_fetcher import pick_video_url
+
+# uvloop's event loop where available (it has no Windows build)
+if sys.platform != "win32":
+    import uvloop
+
+    _run = uvloop.run
+else:
+    _run = asyncio.run
 
 load_dotenv()
 
 VIDEOS_PER_DAY = 3
 
+# FFmpeg encodes are CPU-bound: run a few in separate processes and split
+# the cores between them so they don't oversubscribe the runner
+CPU_COUNT = os.cpu_count() or 1
+COMPOSE_WORKERS = max(1, min(VIDEOS_PER_DAY, CPU_COUNT // 2))
+FFMPEG_THREADS = max(1, CPU_COUNT // COMPOSE_WORKERS)
+
+
+async def _generate_one(
+    i: int,
+    history: dict,
+    output_dir: Path,
+    pick_lock: asyncio.Lock,
+    compose_pool: ProcessPoolExecutor,
+) -> tuple[str, dict]:
+    """Run one quote → background → composition pipeline; returns (video, quote)."""
+    # Picking reads and updates the shared history, so only one pipeline at a time
+    async with pick_lock:
+        # Quote and background lookups don't depend on each other — overlap them
+        print(f"\n[{i}.1] Fetching quote and picking background video...")
+        quote, (video_url, video_id, video_duration) = await asyncio.gather(
+            asyncio.to_thread(fetch_quote, history),
+            asyncio.to_thread(pick_video_url, history),
+        )
+        print(f"  [{i}] \"{quote['content']}\" — {quote['author']}")
+
+        # Record immediately so other pipelines won't reuse the same quote/video
+        history_store.record(history, quote["content"], video_id)
+
+    # Composition is independent across pipelines; FFmpeg streams the
+    # background straight from Pexels instead of a downloaded copy
+    print(f"\n[{i}.2] Composing video...")
+    final_video = await asyncio.get_running_loop().run_in_executor(
+        compose_pool,
+        partial(
+            compose_video,
+            video_url,
+            quote,
+            str(output_dir),
+            index=i,
+            threads=FFMPEG_THREADS,
+            source_duration=video_duration or None,   # unknown → ffprobe it
+        ),
+    )
+    return final_video, quote
+
+
+async def _generate_all(history: dict, output_dir: Path) -> list:
+    """Run VIDEOS_PER_DAY pipelines concurrently; failures are returned, not raised."""
+    pick_lock = asyncio.Lock()
+    # Workers start while other pipelines' threads are mid-request; forking
+    # then could copy a held lock (e.g. stdout's) into the child, so spawn
+    with ProcessPoolExecutor(
+        max_workers=COMPOSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    ) as compose_pool:
+        return await asyncio.gather(
+            *(
+                _generate_one(i, history, output_dir, pick_lock, compose_pool)
+                for i in range(1, VIDEOS_PER_DAY + 1)
+            ),
+            return_exceptions=True,
+        )
+
 
 def main() -> int:
     run_id = str(uuid.uuid4())[:8]
@@ -27,35 +103,30 @@ def main() -> int:
     history = history_store.load()
     print(f"History: {len(history['quotes'])} quotes used, {len(history['videos'])} videos used\n")
 
+    print(f"{'=' * 50}")
+    print(f"  Generating {VIDEOS_PER_DAY} videos")
+    print(f"{'=' * 50}")
+
     video_paths = []
     quotes = []
-
-    for i in range(1, VIDEOS_PER_DAY + 1):
-        print(f"{'=' * 50}")
-        print(f"  Generating video {i} of {VIDEOS_PER_DAY}")
-        print(f"{'=' * 50}")
-
-        # 1. Fetch quote
-        print(f"\n[{i}.1] Fetching quote...")
-        quote = fetch_quote(history)
-        print(f"  \"{quote['content']}\" — {quote['author']}")
-
-        # 2. Download background video
-        print(f"\n[{i}.2] Fetching background video...")
-        video_path, video_id = fetch_video(str(output_dir), history)
-
-        # 3. Compose video
-        print(f"\n[{i}.3] Composing video...")
-        final_video = compose_video(video_path, quote, str(output_dir), index=i)
-
-        # Record immediately so next iteration won't reuse the same quote/video
-        history_store.record(history, quote["content"], video_id)
-
+    failed = 0
+
+    for i, result in enumerate(_run(_generate_all(history, output_dir)), 1):
+        if isinstance(result, Exception):
+            print(f"\nVideo {i} failed:")
+            traceback.print_exception(result)
+            failed += 1
+            continue
+        final_video, quote = result
         video_paths.append(final_video)
         quotes.append(quote)
-        print()
 
-    # 4. Email all 3 videos
+    if not video_paths:
+        print("\nAll videos failed — nothing to send.")
+        return 1
+    print()
+
+    # 4. Email all videos
     print(f"{'=' * 50}")
     print("Sending email...")
     send_daily_videos(video_paths, quotes)
@@ -65,10 +136,14 @@ def main() -> int:
     for final_video, quote in zip(video_paths, quotes):
         post_video(final_video, quote)
 
-    # Save history after full success
+    # Compact the history journal into history.json
     history_store.save(history)
 
     print(f"\nDone! {len(video_paths)} videos in: {output_dir}")
+    if failed:
+        # Deliver what succeeded, but don't let a partial run look green
+        print(f"{failed} of {VIDEOS_PER_DAY} videos failed — see tracebacks above.")
+        return 1
     return 0
 
 
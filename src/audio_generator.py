@@ -1,22 +1,73 @@
 """Generate TTS narration via ElevenLabs REST API and measure its duration."""
 
-import json
+import hashlib
 import os
+import shutil
 import subprocess
+import time
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
 
-import requests
+import orjson
+from mutagen import MutagenError
+from mutagen.mp3 import MP3
+
+from src.http_session import SESSION
 
 
 ELEVENLABS_BASE = "https://api.elevenlabs.io/v1"
 
+# On-disk TTS cache: identical requests are served from here instead of the API.
+# Least recently used clips are evicted beyond TTS_CACHE_MAX_MB (default 200).
+TTS_CACHE_DIR = Path(__file__).parent.parent / "cache" / "tts"
+TTS_CACHE_MAX_MB = 200
+
+# Resolved voice/model IDs are reused across runs for this long
+META_CACHE_FILE = Path(__file__).parent.parent / "cache" / "elevenlabs_meta.json"
+META_CACHE_TTL = 24 * 60 * 60
+
+
+def _load_meta(key: str) -> str | None:
+    """Return a cached account lookup if it is younger than META_CACHE_TTL."""
+    try:
+        entry = orjson.loads(META_CACHE_FILE.read_bytes())[key]
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    if time.time() - entry["ts"] >= META_CACHE_TTL:
+        return None
+    return entry["value"]
+
+
+def _store_meta(key: str, value: str) -> None:
+    try:
+        meta = orjson.loads(META_CACHE_FILE.read_bytes())
+    except (FileNotFoundError, ValueError):
+        meta = {}
+    meta[key] = {"value": value, "ts": time.time()}
+    META_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    META_CACHE_FILE.write_bytes(orjson.dumps(meta))
+
 
+def _invalidate_meta() -> None:
+    """Forget cached voice/model IDs, e.g. after the API rejected them."""
+    META_CACHE_FILE.unlink(missing_ok=True)
+    _get_voice_id.cache_clear()
+    _get_model_id.cache_clear()
+
+
+@lru_cache(maxsize=1)
 def _get_voice_id(api_key: str) -> str:
     """Return configured voice ID or the first available voice on the account."""
     configured = os.environ.get("ELEVENLABS_VOICE_ID", "")
     if configured:
         return configured
 
-    resp = requests.get(
+    cached = _load_meta("voice_id")
+    if cached:
+        return cached
+
+    resp = SESSION.get(
         f"{ELEVENLABS_BASE}/voices",
         headers={"xi-api-key": api_key},
         timeout=10,
@@ -28,16 +79,22 @@ def _get_voice_id(api_key: str) -> str:
 
     voice = voices[0]
     print(f"Using voice: {voice['name']} ({voice['voice_id']})")
+    _store_meta("voice_id", voice["voice_id"])
     return voice["voice_id"]
 
 
+@lru_cache(maxsize=1)
 def _get_model_id(api_key: str) -> str:
     """Return configured model ID or the first TTS-capable model on the account."""
     configured = os.environ.get("ELEVENLABS_MODEL_ID", "")
     if configured:
         return configured
 
-    resp = requests.get(
+    cached = _load_meta("model_id")
+    if cached:
+        return cached
+
+    resp = SESSION.get(
         f"{ELEVENLABS_BASE}/models",
         headers={"xi-api-key": api_key},
         timeout=10,
@@ -53,11 +110,13 @@ def _get_model_id(api_key: str) -> str:
         for m in tts_models:
             if m["model_id"] == pref:
                 print(f"Using model: {m['name']} ({m['model_id']})")
+                _store_meta("model_id", m["model_id"])
                 return m["model_id"]
 
     if tts_models:
         m = tts_models[0]
         print(f"Using model: {m['name']} ({m['model_id']})")
+        _store_meta("model_id", m["model_id"])
         return m["model_id"]
 
     raise RuntimeError("No TTS-capable models found on ElevenLabs account")
@@ -72,7 +131,9 @@ def generate_audio(quote: dict, output_path: str) -> tuple[str, float]:
     voice_id = _get_voice_id(api_key)
     model_id = _get_model_id(api_key)
 
-    text = f"{quote['content']}  — {quote['author']}"
+    # NFKC folds compatibility characters (NBSPs, ligatures, fullwidth forms)
+    # so the voice doesn't stumble on them and equal quotes share a cache key
+    text = unicodedata.normalize("NFKC", f"{quote['content']}  — {quote['author']}")
     print(f"Generating audio ({len(text)} chars): {text[:80]}...")
 
     headers = {
@@ -89,24 +150,77 @@ def generate_audio(quote: dict, output_path: str) -> tuple[str, float]:
         },
     }
 
-    url = f"{ELEVENLABS_BASE}/text-to-speech/{voice_id}"
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
+    dest = os.path.join(output_path, "narration.mp3")
 
-    if not resp.ok:
-        raise RuntimeError(
-            f"ElevenLabs TTS failed {resp.status_code}: {resp.text[:500]}"
-        )
+    key = _cache_key(text, voice_id, model_id, payload["voice_settings"])
+    cached_mp3 = TTS_CACHE_DIR / f"{key}.mp3"
+    cached_meta = TTS_CACHE_DIR / f"{key}.json"
+    if cached_mp3.exists() and cached_meta.exists():
+        shutil.copyfile(cached_mp3, dest)
+        os.utime(cached_mp3)   # mark as recently used; atime updates are often disabled
+        duration = orjson.loads(cached_meta.read_bytes())["duration"]
+        print(f"Audio served from cache: {dest} ({duration:.2f}s)")
+        return dest, duration
 
-    dest = os.path.join(output_path, "narration.mp3")
-    with open(dest, "wb") as f:
-        f.write(resp.content)
+    url = f"{ELEVENLABS_BASE}/text-to-speech/{voice_id}"
+    with SESSION.post(url, headers=headers, data=orjson.dumps(payload), stream=True, timeout=60) as resp:
+        if not resp.ok:
+            if resp.status_code in (401, 404):
+                _invalidate_meta()
+            raise RuntimeError(
+                f"ElevenLabs TTS failed {resp.status_code}: {resp.text[:500]}"
+            )
+
+        # Write audio as it arrives instead of buffering the whole response
+        with open(dest, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1 << 15):
+                f.write(chunk)
 
     duration = _get_duration(dest)
+
+    TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(dest, cached_mp3)
+    cached_meta.write_bytes(orjson.dumps({"duration": duration}))
+    _curate_cache()
+
     print(f"Audio saved: {dest} ({duration:.2f}s)")
     return dest, duration
 
 
+def _cache_key(text: str, voice_id: str, model_id: str, voice_settings: dict) -> str:
+    """Hash every parameter that affects the synthesised audio."""
+    params = {
+        "text": text,
+        "voice": voice_id,
+        "model": model_id,
+        "settings": voice_settings,
+    }
+    return hashlib.sha256(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _curate_cache() -> None:
+    """Evict least recently used clips until the cache fits in TTS_CACHE_MAX_MB."""
+    max_bytes = int(os.environ.get("TTS_CACHE_MAX_MB", TTS_CACHE_MAX_MB)) << 20
+    entries = [(p, p.stat()) for p in TTS_CACHE_DIR.glob("*.mp3")]
+    entries.sort(key=lambda e: e[1].st_atime)
+    total = sum(st.st_size for _, st in entries)
+    for path, st in entries:
+        if total <= max_bytes:
+            break
+        total -= st.st_size
+        path.unlink()
+        path.with_suffix(".json").unlink(missing_ok=True)
+
+
 def _get_duration(path: str) -> float:
+    """Read the duration of an MP3 from its headers, falling back to ffprobe."""
+    try:
+        return MP3(path).info.length
+    except MutagenError:
+        return _ffprobe_duration(path)
+
+
+def _ffprobe_duration(path: str) -> float:
     """Use ffprobe to get the duration of a media file in seconds."""
     cmd = [
         "ffprobe", "-v", "quiet",
@@ -114,8 +228,8 @@ def _get_duration(path: str) -> float:
         "-show_streams",
         path,
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    data = json.loads(result.stdout)
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    data = orjson.loads(result.stdout)
     for stream in data.get("streams", []):
         if "duration" in stream:
             return float(stream["duration"])
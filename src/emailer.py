@@ -1,17 +1,35 @@
-"""Send daily videos via SendGrid — one email per video."""
+"""Send daily videos via SendGrid — one email with every video attached.
+
+When EMAIL_S3_BUCKET is set the videos are uploaded to S3 instead and the
+email carries pre-signed download links (set EMAIL_ATTACH=1 to keep
+attaching them).
+"""
 
 import base64
+import mmap
 import os
 from pathlib import Path
 
-import requests
+import boto3
+import orjson
+
+from src.http_session import SESSION
 
 
 SENDGRID_URL = "https://api.sendgrid.com/v3/mail/send"
+# SendGrid caps a message at 30 MB; keep headroom for headers and body text
+MAX_ATTACHMENT_BYTES = 28 * 1024 * 1024
+# Raw bytes encoded per step; a multiple of 3 so no padding lands mid-stream
+ENCODE_CHUNK = 3 * 1024 * 1024
+# Longest lifetime S3 allows for a SigV4 pre-signed URL
+LINK_EXPIRY_SECONDS = 7 * 24 * 60 * 60
 
 
 def send_daily_videos(video_paths: list[str], quotes: list[dict]) -> bool:
-    """Send one email per video as an attachment via SendGrid.
+    """Send all videos as attachments of a single email via SendGrid.
+
+    Falls back to one email per video when the encoded attachments would
+    exceed MAX_ATTACHMENT_BYTES.
 
     Returns True on success, False if SendGrid env vars are not configured.
     """
@@ -26,54 +44,150 @@ def send_daily_videos(video_paths: list[str], quotes: list[dict]) -> bool:
         )
         return False
 
-    total = len(video_paths)
-    for i, (path, quote) in enumerate(zip(video_paths, quotes), 1):
-        _send_one(api_key, from_email, to_email, path, quote, i, total)
+    bucket = os.environ.get("EMAIL_S3_BUCKET")
+    if bucket and os.environ.get("EMAIL_ATTACH") != "1":
+        _send_links(api_key, from_email, to_email, bucket, video_paths, quotes)
+        return True
+
+    # Base64 size is known from the file size, so nothing is encoded until needed
+    total_bytes = sum(4 * ((os.path.getsize(p) + 2) // 3) for p in video_paths)
+    total_mb = total_bytes / 1024 / 1024
+
+    if total_bytes > MAX_ATTACHMENT_BYTES:
+        print(f"  Attachments total {total_mb:.1f} MB — sending one email per video...")
+        _send_individual_emails(api_key, from_email, to_email, video_paths, quotes)
+        print(f"All {len(video_paths)} emails sent to {to_email}")
+        return True
+
+    attachments = [_attachment(path) for path in video_paths]
+    print(f"  Sending {len(attachments)} videos in one email ({total_mb:.1f} MB)...")
+    body = "\n\n".join(
+        f"Video {i}: \"{quote['content']}\" — {quote['author']}"
+        for i, quote in enumerate(quotes, 1)
+    )
+    payload = _payload(
+        from_email,
+        to_email,
+        subject=f"Your {len(attachments)} TikTok videos are ready",
+        body=f"{body}\n\nAdd your music in TikTok and post.",
+        attachments=attachments,
+    )
+    _post(api_key, payload, "batch email")
 
-    print(f"All {total} emails sent to {to_email}")
+    print(f"Email with {len(attachments)} videos sent to {to_email}")
     return True
 
 
-def _send_one(
+def _send_links(
     api_key: str,
     from_email: str,
     to_email: str,
-    video_path: str,
-    quote: dict,
-    index: int,
-    total: int,
+    bucket: str,
+    video_paths: list[str],
+    quotes: list[dict],
 ) -> None:
-    data = Path(video_path).read_bytes()
-    size_mb = len(data) / 1024 / 1024
-    print(f"  Sending video {index}/{total} ({size_mb:.1f} MB)...")
-
-    body = (
-        f"Video {index} of {total} — ready to upload!\n\n"
-        f"\"{quote['content']}\" — {quote['author']}\n\n"
-        "Add your music in TikTok and post."
+    """Upload the videos to S3 and email pre-signed links instead of attachments."""
+    s3 = boto3.client("s3")
+    lines = []
+    for i, (path, quote) in enumerate(zip(video_paths, quotes), 1):
+        video = Path(path)
+        key = f"tiktok-quotes/{video.parent.name}/{video.name}"
+        print(f"  Uploading video {i}/{len(video_paths)} to s3://{bucket}/{key}...")
+        s3.upload_file(str(video), bucket, key, ExtraArgs={"ContentType": "video/mp4"})
+        url = s3.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=LINK_EXPIRY_SECONDS,
+        )
+        lines.append(f"Video {i}: \"{quote['content']}\" — {quote['author']}\n{url}")
+
+    payload = _payload(
+        from_email,
+        to_email,
+        subject=f"Your {len(video_paths)} TikTok videos are ready",
+        body="\n\n".join(lines) + "\n\nLinks expire in 7 days. Add your music in TikTok and post.",
     )
+    _post(api_key, payload, "link email")
+    print(f"Email with {len(video_paths)} video links sent to {to_email}")
 
+
+def _send_individual_emails(
+    api_key: str,
+    from_email: str,
+    to_email: str,
+    video_paths: list[str],
+    quotes: list[dict],
+) -> None:
+    total = len(video_paths)
+    for index, (path, quote) in enumerate(zip(video_paths, quotes), 1):
+        print(f"  Sending video {index}/{total}...")
+        body = (
+            f"Video {index} of {total} — ready to upload!\n\n"
+            f"\"{quote['content']}\" — {quote['author']}\n\n"
+            "Add your music in TikTok and post."
+        )
+        payload = _payload(
+            from_email,
+            to_email,
+            subject=f"TikTok video {index}/{total} — {quote['author']}",
+            body=body,
+            attachments=[_attachment(path)],
+        )
+        _post(api_key, payload, f"video {index}")
+
+
+def _attachment(video_path: str) -> dict:
+    return {
+        "content": _encode_file(video_path),
+        "type": "video/mp4",
+        "filename": Path(video_path).name,
+        "disposition": "attachment",
+    }
+
+
+def _encode_file(path: str) -> str:
+    """Base64-encode a file without holding a second full copy of its raw bytes."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return ""
+
+    buf = bytearray(4 * ((size + 2) // 3))
+    pos = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset in range(0, size, ENCODE_CHUNK):
+            encoded = base64.b64encode(mm[offset:offset + ENCODE_CHUNK])
+            buf[pos:pos + len(encoded)] = encoded
+            pos += len(encoded)
+    return buf.decode("ascii")
+
+
+def _payload(
+    from_email: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    attachments: list[dict] | None = None,
+) -> dict:
     payload = {
         "personalizations": [{"to": [{"email": to_email}]}],
         "from": {"email": from_email},
-        "subject": f"TikTok video {index}/{total} — {quote['author']}",
+        "subject": subject,
         "content": [{"type": "text/plain", "value": body}],
-        "attachments": [{
-            "content": base64.b64encode(data).decode(),
-            "type": "video/mp4",
-            "filename": Path(video_path).name,
-            "disposition": "attachment",
-        }],
     }
+    if attachments:
+        payload["attachments"] = attachments
+    return payload
+
 
-    resp = requests.post(
+def _post(api_key: str, payload: dict, what: str) -> None:
+    resp = SESSION.post(
         SENDGRID_URL,
         headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-        json=payload,
+        data=orjson.dumps(payload),
         timeout=60,
     )
 
     if resp.status_code not in (200, 202):
         raise RuntimeError(
-            f"SendGrid error on video {index}: {resp.status_code} {resp.text[:300]}"
+            f"SendGrid error on {what}: {resp.status_code} {resp.text[:300]}"
         )
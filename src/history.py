@@ -1,45 +1,129 @@
 """Track used quotes and video IDs to avoid repeats for 365 days."""
 
-import json
+import os
+import re
 from pathlib import Path
 
+import orjson
+
 
 HISTORY_FILE = Path(__file__).parent.parent / "history.json"
+# Append-only log of entries recorded since history.json was last written
+JOURNAL_FILE = Path(__file__).parent.parent / "history.jsonl"
 MAX_ENTRIES = 365
+# Fold the journal back into history.json after this many appends
+COMPACT_EVERY = 30
+# Word-set Jaccard similarity at or above which two quotes count as the same
+SIMILARITY_THRESHOLD = 0.8
 
 
 def load() -> dict:
-    """Load history from disk. Returns {'quotes': [...], 'videos': [...]}."""
+    """Load history.json plus any journaled entries. Returns {'quotes': [...], 'videos': [...]}.
+
+    The returned dict also carries '_qset' / '_vset' mirrors of the lists
+    for O(1) membership checks, '_qwords' for near-duplicate checks and
+    '_journal' (entries not yet compacted); they are never written to
+    history.json.
+    """
     if not HISTORY_FILE.exists():
-        return {"quotes": [], "videos": []}
-    with open(HISTORY_FILE) as f:
-        data = json.load(f)
+        quotes, videos = [], []
+    else:
+        data = orjson.loads(HISTORY_FILE.read_bytes())
+        quotes = data.get("quotes", [])
+        videos = data.get("videos", [])
+
+    qset, vset = set(quotes), set(videos)
+    journaled = 0
+    if JOURNAL_FILE.exists():
+        lines = JOURNAL_FILE.read_bytes().splitlines(keepends=True)
+        for n, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                if n < len(lines) - 1:
+                    raise
+                # A crash mid-append leaves a torn last line; drop it so the
+                # next record() starts on a clean line
+                print(f"  Dropping torn last line of {JOURNAL_FILE.name}: {line[:60]!r}")
+                with open(JOURNAL_FILE, "r+b") as f:
+                    f.truncate(sum(len(l) for l in lines[:n]))
+                break
+            # Already in history.json: a crash after save() replaced it but
+            # before the journal was emptied. record() only logs unused
+            # pairs, so a real entry is never in both sets.
+            if entry["q"] in qset and entry["v"] in vset:
+                continue
+            quotes.append(entry["q"])
+            videos.append(entry["v"])
+            qset.add(entry["q"])
+            vset.add(entry["v"])
+            journaled += 1
+
     return {
-        "quotes": data.get("quotes", []),
-        "videos": data.get("videos", []),
+        "quotes": quotes,
+        "videos": videos,
+        "_qset": qset,
+        "_vset": vset,
+        "_qwords": [_words(q) for q in quotes],
+        "_journal": journaled,
     }
 
 
 def save(history: dict) -> None:
-    """Write history back to disk, trimming each list to MAX_ENTRIES."""
+    """Compact history into history.json, trimming each list to MAX_ENTRIES.
+
+    history.json is replaced atomically before the journal is emptied, so a
+    crash at any point leaves every recorded entry on disk; entries left in
+    the journal after history.json was replaced are skipped by load().
+    """
     trimmed = {
         "quotes": history["quotes"][-MAX_ENTRIES:],
         "videos": history["videos"][-MAX_ENTRIES:],
     }
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(trimmed, f, indent=2)
+    tmp = HISTORY_FILE.with_suffix(".json.tmp")
+    tmp.write_bytes(orjson.dumps(trimmed, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, HISTORY_FILE)
+    JOURNAL_FILE.write_text("")
+    history["_journal"] = 0
     print(f"History saved: {len(trimmed['quotes'])} quotes, {len(trimmed['videos'])} videos tracked")
 
 
 def quote_seen(history: dict, content: str) -> bool:
-    return content in history["quotes"]
+    return content in history["_qset"]
+
+
+def quote_similar(history: dict, content: str) -> bool:
+    """True if content is a near-duplicate (e.g. a rewording) of a used quote."""
+    words = _words(content)
+    if not words:
+        return False
+    for seen in history["_qwords"]:
+        if len(words & seen) / len(words | seen) >= SIMILARITY_THRESHOLD:
+            return True
+    return False
 
 
 def video_seen(history: dict, video_id: int) -> bool:
-    return video_id in history["videos"]
+    return video_id in history["_vset"]
 
 
 def record(history: dict, quote_content: str, video_id: int) -> None:
-    """Append the used quote and video ID to history (in place)."""
+    """Append the used quote and video ID to history (in place) and the journal."""
+    with open(JOURNAL_FILE, "ab") as f:
+        f.write(orjson.dumps({"q": quote_content, "v": video_id}) + b"\n")
+
     history["quotes"].append(quote_content)
     history["videos"].append(video_id)
+    history["_qset"].add(quote_content)
+    history["_vset"].add(video_id)
+    history["_qwords"].append(_words(quote_content))
+
+    history["_journal"] += 1
+    if history["_journal"] >= COMPACT_EVERY:
+        save(history)
+
+
+def _words(content: str) -> frozenset[str]:
+    return frozenset(re.findall(r"[a-z0-9']+", content.lower()))
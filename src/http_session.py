@@ -0,0 +1,29 @@
+"""Shared HTTP session so repeated calls to the same host reuse one connection."""
+
+import atexit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+POOL_SIZE = 8   # connections kept per host; covers concurrent pipelines and chunk uploads
+
+SESSION = requests.Session()
+# Idempotent requests (GET/PUT/...) are retried with backoff on rate limits and
+# transient server errors; POSTs are never retried. The final response is
+# returned as-is so callers' own status handling still applies.
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        ),
+    ),
+)
+atexit.register(SESSION.close)
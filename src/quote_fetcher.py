@@ -1,30 +1,53 @@
 """Fetch a fresh (unused) inspirational quote from ZenQuotes.io."""
 
-import requests
+from src.history import quote_seen, quote_similar
+from src.http_session import SESSION
 
 
+ZENQUOTES_BATCH_URL = "https://zenquotes.io/api/quotes"   # 50 random quotes per call
 ZENQUOTES_URL = "https://zenquotes.io/api/random"
 MAX_ATTEMPTS = 10
 
+# Candidates left over from the last batch call, consumed by later calls
+_batch: list[dict] = []
+
 
 def fetch_quote(history: dict) -> dict:
     """Return a dict with 'content' and 'author' that hasn't been used before.
 
-    Retries up to MAX_ATTEMPTS times to find an unused quote.
+    Candidates come from one ZenQuotes batch call, shared across calls in
+    this process; only when a whole batch is used up does it fall back to
+    up to MAX_ATTEMPTS single random quotes. Rewordings of a used quote
+    count as used.
 
     Raises:
-        RuntimeError: if all attempts return already-used quotes.
+        RuntimeError: if no unused quote can be found.
     """
-    from src.history import quote_seen
+    def unused(quote: dict) -> bool:
+        return not quote_seen(history, quote["content"]) and not quote_similar(history, quote["content"])
+
+    if not _batch:
+        try:
+            resp = SESSION.get(ZENQUOTES_BATCH_URL, timeout=10)
+            resp.raise_for_status()
+            _batch.extend({"content": d["q"], "author": d["a"]} for d in resp.json())
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch quotes from ZenQuotes: {e}")
+
+    while _batch:
+        quote = _batch.pop(0)
+        if unused(quote):
+            return quote
 
+    print("  Every quote in the batch was already used, trying random quotes...")
     for attempt in range(1, MAX_ATTEMPTS + 1):
         try:
-            resp = requests.get(ZENQUOTES_URL, timeout=10)
+            resp = SESSION.get(ZENQUOTES_URL, timeout=10)
             resp.raise_for_status()
             data = resp.json()[0]
             quote = {"content": data["q"], "author": data["a"]}
 
-            if not quote_seen(history, quote["content"]):
+            if unused(quote):
                 return quote
 
             print(f"  Quote already used, retrying ({attempt}/{MAX_ATTEMPTS})...")
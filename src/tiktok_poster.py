@@ -7,13 +7,22 @@ Dual-mode:
 """
 
 import math
+import mmap
 import os
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
+from src.http_session import SESSION
 
 
 CHUNK_SIZE = 10 * 1024 * 1024   # 10 MB per chunk (TikTok minimum is 5 MB)
+# Chunks in flight at once. TikTok's FILE_UPLOAD flow expects chunks in
+# order, so keep this at 1 (strictly sequential) unless that is confirmed
+UPLOAD_WORKERS = 1
+STATUS_POLLS = 10
+POLL_DELAY_MIN = 1.0            # seconds; doubles after each unchanged poll
+POLL_DELAY_MAX = 30.0
 TIKTOK_INIT_URL = "https://open.tiktokapis.com/v2/post/publish/video/init/"
 TIKTOK_STATUS_URL = "https://open.tiktokapis.com/v2/post/publish/status/fetch/"
 
@@ -57,7 +66,7 @@ def post_video(video_path: str, quote: dict) -> bool:
         },
     }
 
-    resp = requests.post(TIKTOK_INIT_URL, headers=headers, json=init_body, timeout=15)
+    resp = SESSION.post(TIKTOK_INIT_URL, headers=headers, json=init_body, timeout=15)
     resp.raise_for_status()
     init_data = resp.json().get("data", {})
     publish_id = init_data.get("publish_id")
@@ -69,47 +78,85 @@ def post_video(video_path: str, quote: dict) -> bool:
     print(f"TikTok upload initialised. publish_id={publish_id}")
 
     # ── 2. Upload chunks ──────────────────────────────────────────────────────
-    with open(video_path, "rb") as f:
-        for chunk_idx in range(chunk_count):
-            chunk_data = f.read(CHUNK_SIZE)
-            start = chunk_idx * CHUNK_SIZE
-            end = start + len(chunk_data) - 1
-            content_range = f"bytes {start}-{end}/{file_size}"
-
-            put_headers = {
-                "Content-Range": content_range,
-                "Content-Length": str(len(chunk_data)),
-                "Content-Type": "video/mp4",
-            }
-            put_resp = requests.put(
-                upload_url,
-                headers=put_headers,
-                data=chunk_data,
-                timeout=120,
-            )
-            put_resp.raise_for_status()
-            print(f"  Chunk {chunk_idx + 1}/{chunk_count} uploaded ({content_range})")
+    # Chunks are sent as zero-copy slices of one read-only mapping of the file
+    with (
+        open(video_path, "rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        memoryview(mm) as view,
+    ):
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as ex:
+            futures = {}
+            for chunk_idx in range(chunk_count):
+                start = chunk_idx * CHUNK_SIZE
+                end = min(start + CHUNK_SIZE, file_size)
+                future = ex.submit(_put_chunk, upload_url, view, start, end, file_size)
+                futures[future] = chunk_idx
+
+            try:
+                for future in as_completed(futures):
+                    content_range = future.result()
+                    print(f"  Chunk {futures[future] + 1}/{chunk_count} uploaded ({content_range})")
+            except BaseException:
+                # Don't send the queued chunks of an upload that already failed
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
 
     # ── 3. Poll publish status ────────────────────────────────────────────────
+    # Exponential backoff with jitter; progress (a status change) resets the delay
     status_body = {"publish_id": publish_id}
-    for attempt in range(10):
-        time.sleep(5)
-        s_resp = requests.post(
+    delay = POLL_DELAY_MIN
+    last_status = None
+    for attempt in range(STATUS_POLLS):
+        time.sleep(delay)
+        s_resp = SESSION.post(
             TIKTOK_STATUS_URL, headers=headers, json=status_body, timeout=15
         )
         s_resp.raise_for_status()
         status_data = s_resp.json().get("data", {})
         status = status_data.get("status", "UNKNOWN")
-        print(f"  Status poll {attempt + 1}/10: {status}")
+        print(f"  Status poll {attempt + 1}/{STATUS_POLLS}: {status}")
         if status == "PUBLISH_COMPLETE":
             print("TikTok post published successfully!")
             return True
         if status in ("FAILED", "SPAM_RISK_TOO_MANY_POSTS"):
             raise RuntimeError(f"TikTok publish failed: {status_data}")
 
+        if status != last_status:
+            delay = POLL_DELAY_MIN
+        else:
+            delay = min(delay * 2, POLL_DELAY_MAX)
+        delay += random.uniform(0, delay * 0.25)
+        last_status = status
+
     raise RuntimeError("TikTok publish timed out after polling")
 
 
+def _put_chunk(
+    upload_url: str,
+    view: memoryview,
+    start: int,
+    end: int,
+    file_size: int,
+) -> str:
+    """PUT bytes [start, end) of the mapped video; returns the Content-Range sent."""
+    content_range = f"bytes {start}-{end - 1}/{file_size}"
+    put_headers = {
+        "Content-Range": content_range,
+        "Content-Length": str(end - start),
+        "Content-Type": "video/mp4",
+    }
+    # Release the slice promptly (even on error) so the mapping can be closed
+    with view[start:end] as chunk:
+        put_resp = SESSION.put(
+            upload_url,
+            headers=put_headers,
+            data=chunk,
+            timeout=120,
+        )
+    put_resp.raise_for_status()
+    return content_range
+
+
 def _print_stub_instructions():
     print(
         "\n"
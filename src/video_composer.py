@@ -1,8 +1,10 @@
 """Compose the final 1080x1920 TikTok video using FFmpeg + Pillow."""
 
 import os
+import random
 import subprocess
 import textwrap
+from functools import lru_cache
 from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
@@ -12,43 +14,148 @@ from PIL import Image, ImageDraw, ImageFont
 W, H = 1080, 1920
 FONT_DIR = Path(__file__).parent.parent / "assets" / "fonts"
 
+# Overlay font sizes
+QUOTE_FONT_SIZE = 58
+AUTHOR_FONT_SIZE = 40
+
 # Video duration in seconds (no narration — fixed length)
 VIDEO_DURATION = 61
 
-
-def _make_text_overlay(quote: dict, output_path: str, index: int = 1) -> str:
-    """Render a transparent PNG with quote text and semi-transparent backdrop.
-
-    Returns the path to the generated PNG.
+# Give up on a stalled HTTP read of the background after this long (µs)
+HTTP_RW_TIMEOUT_US = 30_000_000
+# Upper bound on one FFmpeg composition, well inside the workflow's 15 minutes
+COMPOSE_TIMEOUT = 300
+# Upper bound on reading a background's duration with ffprobe
+PROBE_TIMEOUT = 30
+
+# Overlay canvas reused across compositions in this process (see _make_text_overlay)
+_canvas: Image.Image | None = None
+
+# H.264 encoders in order of preference; hardware first, libx264 always works.
+# Quality settings roughly match libx264 at CRF 26. videotoolbox and qsv are
+# bitrate-driven (qsv's -global_quality selects ICQ, which ignores -maxrate).
+ENCODER_ARGS = {
+    "h264_nvenc": ["-preset", "p4", "-rc", "vbr", "-cq", "26", "-b:v", "0"],
+    "h264_videotoolbox": ["-b:v", "2000k"],
+    "h264_qsv": ["-preset", "faster", "-b:v", "2000k"],
+    "libx264": ["-preset", "fast", "-crf", "26"],
+}
+
+# Rate control and pixel format sent with every encoder
+OUTPUT_ARGS = [
+    "-maxrate", "2500k",    # hard bitrate cap keeps file under ~8 MB for 20s
+    "-bufsize", "5000k",
+    "-pix_fmt", "yuv420p",
+]
+
+
+@lru_cache(maxsize=1)
+def _pick_encoder() -> str:
+    """Return the first encoder in ENCODER_ARGS that works on this machine.
+
+    `ffmpeg -encoders` lists what FFmpeg was built with, not what hardware
+    is present, so each listed hardware encoder must pass a tiny test encode
+    run with the same flags compose_video uses.
+    """
+    listing = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True
+    ).stdout
+    for encoder in ENCODER_ARGS:
+        if encoder == "libx264":
+            break
+        if f" {encoder} " not in listing:
+            continue
+        probe = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-v", "error",
+                "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                "-c:v", encoder, *ENCODER_ARGS[encoder], *OUTPUT_ARGS,
+                "-f", "null", "-",
+            ],
+            capture_output=True,
+        )
+        if probe.returncode == 0:
+            return encoder
+    return "libx264"
+
+
+@lru_cache(maxsize=16)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    """Load Montserrat Bold at the given size, parsing the TTF once per size."""
+    return ImageFont.truetype(str(FONT_DIR / "Montserrat-Bold.ttf"), size)
+
+
+def _make_text_overlay(quote: dict) -> Image.Image:
+    """Render a transparent W×H RGBA image with quote text and semi-transparent backdrop.
+
+    The image is a canvas reused (and cleared) by the next call, so consume
+    it before rendering another overlay in the same process.
     """
-    img = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    global _canvas
+    if _canvas is None:
+        _canvas = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    else:
+        _canvas.paste((0, 0, 0, 0), (0, 0, W, H))
+    img = _canvas
     draw = ImageDraw.Draw(img)
 
-    font_path = str(FONT_DIR / "Montserrat-Bold.ttf")
+    box, quote_lines, author_line = _layout(quote["content"], quote["author"])
+
+    # ── Semi-transparent rounded rectangle ───────────────────────────────────
+    # The canvas is fully transparent, so drawing straight onto it gives the
+    # same pixels as compositing a separate layer
+    draw.rounded_rectangle(box, radius=32, fill=(0, 0, 0, int(255 * 0.65)))
+
+    # ── Draw quote lines ──────────────────────────────────────────────────────
+    quote_font = _font(QUOTE_FONT_SIZE)
+    # A thin dark outline (one glyph pass with stroke) keeps text legible
+    for x, y, line in quote_lines:
+        draw.text(
+            (x, y), line, font=quote_font, fill=(255, 255, 255, 255),
+            stroke_width=2, stroke_fill=(0, 0, 0, 160),
+        )
+
+    # ── Draw author ───────────────────────────────────────────────────────────
+    author_font = _font(AUTHOR_FONT_SIZE)
+    ax, ay, text = author_line
+    draw.text(
+        (ax, ay), text, font=author_font, fill=(220, 220, 220, 230),
+        stroke_width=2, stroke_fill=(0, 0, 0, 140),
+    )
+
+    return img
 
-    # ── Font sizes ────────────────────────────────────────────────────────────
-    quote_font_size = 58
-    quote_font = ImageFont.truetype(font_path, quote_font_size)
 
-    author_font_size = 40
-    author_font = ImageFont.truetype(font_path, author_font_size)
+@lru_cache(maxsize=32)
+def _layout(content: str, author: str) -> tuple:
+    """Work out where the backdrop and each text line go for a quote.
+
+    Depends only on the quote text, so re-rendering the same quote (e.g.
+    over another background) skips all wrapping and measuring.
+
+    Returns:
+        (box corners, ((x, y, line), ...) for the quote, (x, y, line) for the author)
+    """
+    quote_font = _font(QUOTE_FONT_SIZE)
+    author_font = _font(AUTHOR_FONT_SIZE)
 
     # ── Word-wrap to fit safely inside the box ────────────────────────────────
     # Available text width = canvas - box margins (120px each side) - inner padding (80px each side)
     # Box spans x: 120 to 960 = 840px wide; inner text area = 840 - 160 = 680px
     max_text_w = 680
-    lines = _wrap_to_width(draw, quote["content"], quote_font, max_text_w)
-    author_line = f"— {quote['author']}"
+    lines = _wrap_to_width(content, quote_font, max_text_w)
+    author_line = f"— {author}"
 
     line_spacing = 16
-    line_heights = [draw.textbbox((0, 0), l, font=quote_font)[3] for l in lines]
+    line_bboxes = [quote_font.getbbox(l) for l in lines]
+    line_heights = [bbox[3] for bbox in line_bboxes]
     total_quote_h = sum(line_heights) + line_spacing * (len(lines) - 1)
 
-    author_bbox = draw.textbbox((0, 0), author_line, font=author_font)
+    author_bbox = author_font.getbbox(author_line)
     author_h = author_bbox[3] - author_bbox[1]
 
     gap = 28
-    pad_x, pad_y = 80, 60   # padding between text block and box edges
+    pad_y = 60   # padding between text block and box edges
     block_h = total_quote_h + gap + author_h
 
     # Center the block at 38% down the frame
@@ -58,54 +165,45 @@ def _make_text_overlay(quote: dict, output_path: str, index: int = 1) -> str:
     box_left   = 120
     box_right  = W - 120
 
-    # ── Semi-transparent rounded rectangle ───────────────────────────────────
-    overlay = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-    odraw = ImageDraw.Draw(overlay)
-    odraw.rounded_rectangle(
-        [(box_left, box_top), (box_right, box_bottom)],
-        radius=32,
-        fill=(0, 0, 0, int(255 * 0.65)),
-    )
-    img = Image.alpha_composite(img, overlay)
-    draw = ImageDraw.Draw(img)
-
-    # ── Draw quote lines ──────────────────────────────────────────────────────
     y = center_y - block_h // 2
-    for line, lh in zip(lines, line_heights):
-        bbox = draw.textbbox((0, 0), line, font=quote_font)
-        line_w = bbox[2] - bbox[0]
-        x = (W - line_w) // 2
-        draw.text((x + 2, y + 2), line, font=quote_font, fill=(0, 0, 0, 160))
-        draw.text((x, y), line, font=quote_font, fill=(255, 255, 255, 255))
+    quote_lines = []
+    for line, bbox, lh in zip(lines, line_bboxes, line_heights):
+        x = (W - (bbox[2] - bbox[0])) // 2
+        quote_lines.append((x, y, line))
         y += lh + line_spacing
 
-    # ── Draw author ───────────────────────────────────────────────────────────
     y += gap
-    abbox = draw.textbbox((0, 0), author_line, font=author_font)
-    ax = (W - (abbox[2] - abbox[0])) // 2
-    draw.text((ax + 2, y + 2), author_line, font=author_font, fill=(0, 0, 0, 140))
-    draw.text((ax, y), author_line, font=author_font, fill=(220, 220, 220, 230))
+    ax = (W - (author_bbox[2] - author_bbox[0])) // 2
 
-    dest = os.path.join(output_path, f"text_overlay_{index}.png")
-    img.save(dest, "PNG")
-    return dest
+    return (
+        ((box_left, box_top), (box_right, box_bottom)),
+        tuple(quote_lines),
+        (ax, y, author_line),
+    )
 
 
-def _wrap_to_width(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, max_w: int) -> list[str]:
-    """Word-wrap text so no line exceeds max_w pixels."""
+def _wrap_to_width(text: str, font: ImageFont.FreeTypeFont, max_w: int) -> list[str]:
+    """Word-wrap text so no line exceeds max_w pixels.
+
+    Each word is measured once and line widths are summed from advance
+    widths, rather than re-measuring every growing candidate line.
+    """
     words = text.split()
+    widths = [font.getlength(word) for word in words]
+    space_w = font.getlength(" ")
     lines = []
     current = []
+    current_w = 0.0
 
-    for word in words:
-        test = " ".join(current + [word])
-        bbox = draw.textbbox((0, 0), test, font=font)
-        if bbox[2] - bbox[0] <= max_w:
+    for word, word_w in zip(words, widths):
+        if current and current_w + space_w + word_w <= max_w:
             current.append(word)
+            current_w += space_w + word_w
         else:
             if current:
                 lines.append(" ".join(current))
             current = [word]
+            current_w = word_w
 
     if current:
         lines.append(" ".join(current))
@@ -113,22 +211,47 @@ def _wrap_to_width(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTyp
     return lines
 
 
+def _probe_duration(source: str) -> float:
+    """Duration of a media file/URL in seconds, or 0.0 if ffprobe can't tell."""
+    cmd = ["ffprobe", "-v", "error"]
+    if source.startswith("http"):
+        cmd += ["-rw_timeout", str(HTTP_RW_TIMEOUT_US)]
+    cmd += ["-show_entries", "format=duration", "-of", "csv=p=0", source]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+        return float(result.stdout.strip())
+    except (subprocess.TimeoutExpired, ValueError):
+        return 0.0
+
+
 def compose_video(
-    video_path: str,
+    video_source: str,
     quote: dict,
     output_path: str,
     index: int = 1,
+    threads: int = 0,
+    source_duration: float | None = None,
 ) -> str:
     """Compose the final TikTok-ready MP4 (no audio).
 
+    video_source is a local file or an http(s) URL; URLs are streamed by
+    FFmpeg directly, so the background never has to be downloaded first.
+
     Steps:
-      1. Generate Pillow text overlay PNG.
-      2. Run FFmpeg: blurred-bg + centered fg + text layer → output.
+      1. Render the Pillow text overlay in memory.
+      2. Run FFmpeg: scaled bg + text layer (raw RGBA piped on stdin) → output.
+
+    threads caps FFmpeg's encoder threads (0 lets FFmpeg decide); set it
+    when several compositions run side by side.
+
+    A background long enough for VIDEO_DURATION is entered at a random
+    point instead of being looped; source_duration (seconds) skips the
+    ffprobe call when the caller already knows it.
 
     Returns:
         Path to the final tiktok_final.mp4.
     """
-    overlay_path = _make_text_overlay(quote, output_path, index)
+    overlay = _make_text_overlay(quote)
     dest = os.path.join(output_path, f"tiktok_video_{index}.mp4")
 
     # Scale portrait video to fill 1080x1920, crop any overflow, then overlay text
@@ -138,29 +261,53 @@ def compose_video(
         "[bg][1:v] overlay=0:0 [video_out]"
     )
 
+    # Ride out dropped connections when reading the background over HTTP
+    source_args = []
+    if video_source.startswith("http"):
+        source_args = [
+            "-rw_timeout", str(HTTP_RW_TIMEOUT_US),
+            "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5",
+        ]
+
+    # Long enough: fast keyframe seek to a random in-point. Too short: loop it.
+    if source_duration is None:
+        source_duration = _probe_duration(video_source)
+    if source_duration >= VIDEO_DURATION + 2:
+        start = random.uniform(0, source_duration - VIDEO_DURATION - 1)
+        source_args += ["-ss", f"{start:.2f}"]
+    else:
+        source_args += ["-stream_loop", "-1"]
+
+    encoder = _pick_encoder()
     cmd = [
         "ffmpeg", "-y",
-        "-stream_loop", "-1",
-        "-i", video_path,       # input 0: background video (looped)
-        "-i", overlay_path,     # input 1: text overlay PNG
+        *source_args,
+        "-i", video_source,     # input 0: background video
+        # input 1: text overlay as one raw RGBA frame on stdin (no PNG encode/decode)
+        "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{W}x{H}",
+        "-i", "pipe:0",
         "-filter_complex", filter_complex,
         "-map", "[video_out]",
         "-t", str(VIDEO_DURATION),
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "26",
-        "-maxrate", "2500k",    # hard bitrate cap keeps file under ~8 MB for 20s
-        "-bufsize", "5000k",
-        "-pix_fmt", "yuv420p",
+        "-c:v", encoder,
+        *ENCODER_ARGS[encoder],
+        *OUTPUT_ARGS,
+        "-threads", str(threads),
         "-an",                  # no audio
         "-movflags", "+faststart",
         dest,
     ]
 
-    print("Running FFmpeg composition...")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    print(f"Running FFmpeg composition ({encoder})...")
+    try:
+        result = subprocess.run(
+            cmd, input=overlay.tobytes(), capture_output=True, timeout=COMPOSE_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"FFmpeg timed out after {COMPOSE_TIMEOUT}s")
     if result.returncode != 0:
-        raise RuntimeError(f"FFmpeg failed:\n{result.stderr[-2000:]}")
+        stderr = result.stderr.decode(errors="replace")
+        raise RuntimeError(f"FFmpeg failed:\n{stderr[-2000:]}")
 
     size_mb = os.path.getsize(dest) / (1024 * 1024)
     print(f"Video saved: {dest} ({size_mb:.1f} MB, {VIDEO_DURATION}s)")
@@ -2,7 +2,9 @@
 
 import os
 import random
-import requests
+
+from src.history import video_seen
+from src.http_session import SESSION
 
 
 PEXELS_VIDEO_URL = "https://api.pexels.com/videos/search"
@@ -22,21 +24,16 @@ SEARCH_QUERIES = [
 ]
 
 
-def fetch_video(output_path: str, history: dict) -> tuple[str, int]:
-    """Download a random unused portrait video to output_path/background.mp4.
-
-    Args:
-        output_path: Directory where the video will be saved.
-        history: History dict used to skip already-used video IDs.
+def pick_video_url(history: dict) -> tuple[str, int, float]:
+    """Choose a random unused portrait video for FFmpeg to read straight from Pexels.
 
     Returns:
-        (absolute path to downloaded file, pexels video id)
+        (download URL of the best-fitting file, pexels video id,
+         duration in seconds as reported by Pexels — 0 if unknown)
 
     Raises:
-        RuntimeError: if no suitable unused video is found or download fails.
+        RuntimeError: if no suitable unused video is found.
     """
-    from src.history import video_seen
-
     api_key = os.environ.get("PEXELS_API_KEY")
     if not api_key:
         raise RuntimeError("PEXELS_API_KEY environment variable is not set")
@@ -52,7 +49,7 @@ def fetch_video(output_path: str, history: dict) -> tuple[str, int]:
             "size": "medium",
         }
 
-        resp = requests.get(PEXELS_VIDEO_URL, headers=headers, params=params, timeout=15)
+        resp = SESSION.get(PEXELS_VIDEO_URL, headers=headers, params=params, timeout=15)
         resp.raise_for_status()
         videos = resp.json().get("videos", [])
 
@@ -74,20 +71,13 @@ def fetch_video(output_path: str, history: dict) -> tuple[str, int]:
         candidates = portrait_files if portrait_files else all_files
         hd_files = [f for f in candidates if f.get("height", 0) <= 1920]
         final_candidates = hd_files if hd_files else candidates
-        video_files = sorted(final_candidates, key=lambda f: f.get("height", 0), reverse=True)
-        if not video_files:
+        best = max(final_candidates, key=lambda f: f.get("height", 0), default=None)
+        if best is None:
             continue
 
-        video_url = video_files[0]["link"]
-        dest = os.path.join(output_path, "background.mp4")
-
-        print(f"Downloading video #{video['id']}: {query!r} → {video_url[:60]}...")
-        with requests.get(video_url, stream=True, timeout=60) as r:
-            r.raise_for_status()
-            with open(dest, "wb") as f:
-                for chunk in r.iter_content(chunk_size=1 << 16):
-                    f.write(chunk)
-
-        return dest, video["id"]
+        video_url = best["link"]
+        print(f"Picked video #{video['id']}: {query!r} → {video_url[:60]}...")
+        return video_url, video["id"], float(video.get("duration") or 0)
 
     raise RuntimeError(f"Could not find an unused video after {MAX_ATTEMPTS} attempts")
+